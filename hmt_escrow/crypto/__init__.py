@@ -1,5 +1,7 @@
-import codecs
+import binascii
 import os
+from functools import lru_cache
+from typing import Iterator, Union
 
 from eth_keys import keys as eth_keys
 
@@ -13,6 +15,37 @@ SHARED_MAC_DATA: bytes = os.getenv(
 ).encode("ascii")
 
 
+@lru_cache(maxsize=128)
+def _priv_key_obj(private_key: bytes) -> eth_keys.PrivateKey:
+    """
+    Parses a hex encoded private key. Cached, as building a PrivateKey also
+    derives its public key.
+    """
+    return eth_keys.PrivateKey(binascii.unhexlify(private_key))
+
+
+@lru_cache(maxsize=128)
+def _pub_key_obj(public_key: bytes) -> eth_keys.PublicKey:
+    """Parses a hex encoded public key. Cached to skip repeated decoding."""
+    return eth_keys.PublicKey(binascii.unhexlify(public_key))
+
+
+def decrypt_bytes(private_key: bytes, msg: bytes) -> bytes:
+    """
+    Use ECIES to decrypt a message with a given private key and an optional
+    MAC, without decoding the plaintext.
+
+    Args:
+        private_key (bytes): The private_key to decrypt the message with.
+        msg (bytes): The message to be decrypted.
+
+    Returns:
+        bytes: returns the raw plaintext equivalent to the originally encrypted one.
+    """
+    priv_key = _priv_key_obj(private_key)
+    return encryption.decrypt(msg, priv_key, shared_mac_data=SHARED_MAC_DATA)
+
+
 def decrypt(private_key: bytes, msg: bytes) -> str:
     """
     Use ECIES to decrypt a message with a given private key and an optional
@@ -25,28 +58,45 @@ def decrypt(private_key: bytes, msg: bytes) -> str:
     Returns:
         str: returns the plaintext equivalent to the originally encrypted one.
     """
-    priv_key = eth_keys.PrivateKey(codecs.decode(private_key, "hex"))
-    e = encryption.decrypt(msg, priv_key, shared_mac_data=SHARED_MAC_DATA)
-    return e.decode("utf-8")
+    return decrypt_bytes(private_key, msg).decode("utf-8")
 
 
-def encrypt(public_key: bytes, msg: str) -> bytes:
+def encrypt(public_key: bytes, msg: Union[str, bytes]) -> bytes:
     """
     Use ECIES to encrypt a message with a given public key and optional MAC.
 
     Args:
         public_key (bytes): The public_key to encrypt the message with.
-        msg (str): The message to be encrypted.
+        msg (Union[str, bytes]): The message to be encrypted. Strings are
+            utf-8 encoded, bytes are encrypted as they are.
 
     Returns:
         bytes: returns the cryptotext encrypted with the public key.
 
     """
-    pub_key = eth_keys.PublicKey(codecs.decode(public_key, "hex"))
-    msg_bytes = msg.encode("utf-8")
+    pub_key = _pub_key_obj(public_key)
+    msg_bytes = msg.encode("utf-8") if isinstance(msg, str) else msg
     return encryption.encrypt(msg_bytes, pub_key, shared_mac_data=SHARED_MAC_DATA)
 
 
+def encrypt_stream(public_key: bytes, msg: bytes) -> Iterator[bytes]:
+    """
+    Use ECIES to encrypt a message with a given public key and optional MAC,
+    producing the cryptotext in chunks so it can be sent while being encrypted.
+
+    Args:
+        public_key (bytes): The public_key to encrypt the message with.
+        msg (bytes): The message to be encrypted.
+
+    Returns:
+        Iterator[bytes]: returns the chunks of the cryptotext, which joined
+            are the same as what encrypt returns.
+
+    """
+    pub_key = _pub_key_obj(public_key)
+    return encryption.encrypt_stream(msg, pub_key, shared_mac_data=SHARED_MAC_DATA)
+
+
 def is_encrypted(msg: bytes) -> bool:
     """Returns whether message is already encrypted."""
     return encryption.is_encrypted(msg)
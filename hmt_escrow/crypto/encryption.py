@@ -34,6 +34,7 @@ from cryptography.hazmat.primitives.ciphers import Cipher
 from cryptography.hazmat.primitives.ciphers.algorithms import AES
 from cryptography.hazmat.primitives.ciphers.modes import CTR
 from cryptography.hazmat.primitives.constant_time import bytes_eq
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
 from eth_keys import (
     datatypes as eth_datatypes,
     keys as eth_keys,
@@ -66,6 +67,9 @@ class Encryption:
     format byte
     """
 
+    STREAM_CHUNK_SIZE: int = 1024 * 1024
+    """ Amount of plaintext encrypted at a time by encrypt_stream. """
+
     @staticmethod
     def is_encrypted(data: bytes) -> bool:
         """
@@ -94,12 +98,82 @@ class Encryption:
         Returns:
             bytes: Encrypted byte string
         """
+        header, cipher_context, mac = self._start_encryption(public_key)
+
+        ciphertext = cipher_context.update(data) + cipher_context.finalize()
+
+        # the MAC of a message (called the tag) as per SEC 1, 3.5.
+        mac.update(ciphertext)
+        mac.update(shared_mac_data)
+
+        # 4) 0x04 || R || AsymmetricEncrypt(shared-secret, plaintext) || tag
+        return b"".join((header, ciphertext, mac.finalize()))
+
+    def encrypt_stream(
+        self,
+        data: bytes,
+        public_key: eth_datatypes.PublicKey,
+        shared_mac_data: bytes = b"",
+    ) -> t.Iterator[bytes]:
+        """
+        Encrypt data with ECIES method to the given public key, producing the
+        encrypted byte string in chunks instead of all at once.
+
+        The concatenation of the chunks is identical to what encrypt returns.
+
+        Args:
+            data (bytes): Data to be encrypted, any bytes-like object.
+            public_key (eth_datatypes.PublicKey): Public to be used to encrypt
+                provided data.
+            shared_mac_data (bytes): shared mac additional data as suffix.
+        Returns:
+            t.Iterator[bytes]: Chunks of the encrypted byte string
+        """
+        # Keys are set up right away so that an invalid public key fails
+        # here rather than on the first chunk.
+        header, cipher_context, mac = self._start_encryption(public_key)
+
+        def chunks() -> t.Iterator[bytes]:
+            yield header
+
+            with memoryview(data) as view:
+                for start in range(0, len(view), self.STREAM_CHUNK_SIZE):
+                    chunk = cipher_context.update(
+                        view[start : start + self.STREAM_CHUNK_SIZE]
+                    )
+                    mac.update(chunk)
+                    yield chunk
+
+            chunk = cipher_context.finalize()
+            mac.update(chunk)
+            mac.update(shared_mac_data)
+            yield chunk + mac.finalize()
+
+        return chunks()
+
+    def _start_encryption(
+        self, public_key: eth_datatypes.PublicKey
+    ) -> t.Tuple[bytes, t.Any, hmac.HMAC]:
+        """
+        Sets up the keys of an ECIES encryption to the given public key
+        1) generate r = random value
+        2) generate shared-secret = kdf( ecdhAgree(r, P) )
+        3) generate R = rG [same op as generating a public key]
+
+        Args:
+            public_key (eth_datatypes.PublicKey): Public to be used to encrypt.
+        Returns:
+            The header (0x04 || R || IV), the cipher context to encrypt the
+            plaintext with and the tag HMAC, already fed with the IV.
+        """
         # 1) generate r = random value
-        ephemeral = self.generate_private_key()
+        # The ephemeral key is kept as an OpenSSL key: wrapping it into an
+        # eth_keys key would derive R with a pure Python point multiplication.
+        ephemeral = ec.generate_private_key(curve=self.ELLIPTIC_CURVE)
 
         # 2) generate shared-secret = key_derivation( key_exchange(r, P) )
         try:
-            key_material = self._process_key_exchange(ephemeral, public_key)
+            key_material = self._exchange(ephemeral, public_key)
         except exceptions.InvalidPublicKey as exc:
             raise exceptions.DecryptionError(
                 "Failed to generate shared secret with" f" pubkey {public_key!r}: {exc}"
@@ -113,22 +187,19 @@ class Encryption:
         key_mac = hashlib.sha256(key_mac).digest()
 
         # 3) generate R = rG [same op as generating a public key]
-        ephem_pub_key = ephemeral.public_key
+        ephem_pub_key = ephemeral.public_key().public_bytes(
+            Encoding.X962, PublicFormat.UncompressedPoint
+        )[1:]
 
-        # Encrypt
         algo = self.CIPHER(key_enc)
         block_size = os.urandom(algo.block_size // 8)
 
         cipher_context = Cipher(algo, self.MODE(block_size)).encryptor()
-        ciphertext = cipher_context.update(data) + cipher_context.finalize()
 
-        # 4) 0x04 || R || AsymmetricEncrypt(shared-secret, plaintext) || tag
-        msg = b"\x04" + ephem_pub_key.to_bytes() + block_size + ciphertext
+        mac = hmac.HMAC(key_mac, hashes.SHA256())
+        mac.update(block_size)
 
-        # the MAC of a message (called the tag) as per SEC 1, 3.5.
-        msg_start = 1 + self.PUBLIC_KEY_LEN
-        tag = self._hmac_sha256(key_mac, msg[msg_start:] + shared_mac_data)
-        return msg + tag
+        return b"".join((b"\x04", ephem_pub_key, block_size)), cipher_context, mac
 
     def decrypt(
         self,
@@ -145,7 +216,7 @@ class Encryption:
         [where R = r*G, and recipientPublic = recipientPrivate*G]
 
         Args:
-            data (bytes): Data to be decrypted
+            data (bytes): Data to be decrypted, any bytes-like object.
             private_key (eth_datatypes.PrivateKey):  Private key to be used in
                 agreement.
             shared_mac_data (bytes): shared mac additional data as suffix.
@@ -155,8 +226,11 @@ class Encryption:
         if self.is_encrypted(data) is False:
             raise exceptions.DecryptionError("wrong ecies header")
 
+        # Slices of a memoryview don't copy the (potentially large) payload.
+        view = memoryview(data)
+
         #  1) generate shared-secret = kdf( ecdhAgree(myPrivKey, msg[1:65]) )
-        shared = data[1 : 1 + self.PUBLIC_KEY_LEN]
+        shared = bytes(view[1 : 1 + self.PUBLIC_KEY_LEN])
 
         try:
             key_material = self._process_key_exchange(
@@ -173,11 +247,11 @@ class Encryption:
         key_enc, key_mac = key[:k_len], key[k_len:]
 
         key_mac = hashlib.sha256(key_mac).digest()
-        tag = data[-self.KEY_LEN :]
+        tag = bytes(view[-self.KEY_LEN :])
 
         # 2) Verify tag
         expected_tag = self._hmac_sha256(
-            key_mac, data[1 + self.PUBLIC_KEY_LEN : -self.KEY_LEN] + shared_mac_data
+            key_mac, view[1 + self.PUBLIC_KEY_LEN : -self.KEY_LEN], shared_mac_data
         )
 
         # Whether same tag byte
@@ -189,10 +263,10 @@ class Encryption:
         block_size = algo.block_size // 8
 
         data_start = 1 + self.PUBLIC_KEY_LEN
-        data_slice = data[data_start : data_start + block_size]
+        data_slice = bytes(view[data_start : data_start + block_size])
 
         cipher_context = Cipher(algo, self.MODE(data_slice)).decryptor()
-        ciphertext = data[data_start + block_size : -self.KEY_LEN]
+        ciphertext = view[data_start + block_size : -self.KEY_LEN]
 
         return cipher_context.update(ciphertext) + cipher_context.finalize()
 
@@ -227,14 +301,33 @@ class Encryption:
         private_key_int = int(t.cast(int, private_key))
         ec_private_key = ec.derive_private_key(private_key_int, self.ELLIPTIC_CURVE)
 
+        return self._exchange(ec_private_key, public_key)
+
+    def _exchange(
+        self,
+        ec_private_key: ec.EllipticCurvePrivateKey,
+        public_key: eth_datatypes.PublicKey,
+    ) -> bytes:
+        """
+        Performs the ECDH exchange between an OpenSSL backed private key and
+        an eth_keys public key.
+
+        Args:
+            ec_private_key (ec.EllipticCurvePrivateKey): Private key to be used
+                in agreement (the initiator).
+            public_key (eth_datatypes.PublicKey): Public key to be exchanged
+                (responder).
+
+        Returns:
+            Shared secret resulted of the exchange between the two keys.
+        """
         public_key_bytes = b"\x04" + public_key.to_bytes()
 
         try:
             # either of these can raise a ValueError:
-            elliptic_pub_nums = ec.EllipticCurvePublicKey.from_encoded_point(
+            ec_pub_key = ec.EllipticCurvePublicKey.from_encoded_point(
                 self.ELLIPTIC_CURVE, public_key_bytes
             )
-            ec_pub_key = elliptic_pub_nums.public_numbers().public_key()
 
             return ec_private_key.exchange(ec.ECDH(), ec_pub_key)
 
@@ -300,10 +393,14 @@ class Encryption:
         return key[: self.KEY_LEN]
 
     @staticmethod
-    def _hmac_sha256(key: bytes, msg: bytes) -> bytes:
-        """Generates hash MAC using SHA256 Hash Algorithm"""
+    def _hmac_sha256(key: bytes, *msgs: bytes) -> bytes:
+        """
+        Generates hash MAC using SHA256 Hash Algorithm over the concatenation
+        of msgs, feeding them one by one instead of joining them first.
+        """
         mac = hmac.HMAC(key, hashes.SHA256())
-        mac.update(msg)
+        for msg in msgs:
+            mac.update(msg)
         return mac.finalize()
 
     @staticmethod
@@ -1,5 +1,7 @@
 import logging
 import os
+import threading
+from functools import lru_cache
 from time import sleep
 from typing import Dict, Any
 
@@ -25,15 +27,6 @@ HMTOKEN_ADDR = Web3.toChecksumAddress(
 )
 
 CONTRACT_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "contracts")
-CONTRACTS = compile_files(
-    [
-        "{}/Escrow.sol".format(CONTRACT_FOLDER),
-        "{}/EscrowFactory.sol".format(CONTRACT_FOLDER),
-        "{}/HMToken.sol".format(CONTRACT_FOLDER),
-        "{}/HMTokenInterface.sol".format(CONTRACT_FOLDER),
-        "{}/SafeMath.sol".format(CONTRACT_FOLDER),
-    ]
-)
 
 # See more details about the eth-kvstore here: https://github.com/hCaptcha/eth-kvstore
 KVSTORE_CONTRACT = Web3.toChecksumAddress(
@@ -42,6 +35,10 @@ KVSTORE_CONTRACT = Web3.toChecksumAddress(
 WEB3_POLL_LATENCY = float(os.getenv("WEB3_POLL_LATENCY", 5))
 WEB3_TIMEOUT = int(os.getenv("WEB3_TIMEOUT", 240))
 
+# Web3 instances are cached per endpoint and per thread: a websocket provider
+# holds a single connection, which can't serve concurrent requests.
+_W3_CLIENTS = threading.local()
+
 
 class Retry(object):
     """Retry class holding retry parameters"""
@@ -59,6 +56,35 @@ class Retry(object):
         self.backoff = backoff
 
 
+@lru_cache(maxsize=1)
+def get_contracts() -> Dict[str, Any]:
+    """Compile the solidity contracts on first use and cache the result.
+
+    Compiling spawns solc, so it is deferred until a contract interface is
+    actually needed instead of running on import.
+
+    Returns:
+        Dict[str, Any]: the compiled contracts, keyed by their entrypoint.
+
+    """
+    return compile_files(
+        [
+            "{}/Escrow.sol".format(CONTRACT_FOLDER),
+            "{}/EscrowFactory.sol".format(CONTRACT_FOLDER),
+            "{}/HMToken.sol".format(CONTRACT_FOLDER),
+            "{}/HMTokenInterface.sol".format(CONTRACT_FOLDER),
+            "{}/SafeMath.sol".format(CONTRACT_FOLDER),
+        ]
+    )
+
+
+def __getattr__(name: str) -> Any:
+    # CONTRACTS used to be compiled at import; keep it available lazily.
+    if name == "CONTRACTS":
+        return get_contracts()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_w3(hmt_server_addr: str = None) -> Web3:
     """Set up the web3 provider for serving transactions to the ethereum network.
 
@@ -67,6 +93,8 @@ def get_w3(hmt_server_addr: str = None) -> Web3:
     <class 'web3.main.Web3'>
     >>> type(w3.provider)
     <class 'web3.providers.rpc.HTTPProvider'>
+    >>> get_w3() is w3
+    True
 
     >>> os.environ["HMT_ETH_SERVER"] = "wss://localhost:8546"
     >>> w3 = get_w3()
@@ -91,6 +119,27 @@ def get_w3(hmt_server_addr: str = None) -> Web3:
     if not endpoint:
         endpoint = os.getenv("HMT_ETH_SERVER", "http://localhost:8545")
 
+    clients: Dict[str, Web3] = getattr(_W3_CLIENTS, "clients", None)
+    if clients is None:
+        clients = _W3_CLIENTS.clients = {}
+
+    w3 = clients.get(endpoint)
+    if w3 is None:
+        w3 = clients[endpoint] = _connect_w3(endpoint)
+
+    return w3
+
+
+def _connect_w3(endpoint: str) -> Web3:
+    """Builds a new web3 instance for the given endpoint.
+
+    Args:
+        endpoint: ethereum node address, EthereumTesterProvider is used if empty.
+
+    Returns:
+        Web3: returns the web3 provider.
+
+    """
     if not endpoint:
         LOG.error("Using EthereumTesterProvider as we have no HMT_ETH_SERVER")
 
@@ -195,7 +244,7 @@ def get_contract_interface(contract_entrypoint):
         returns the contract interface containing the contract abi.
 
     """
-    compiled_sol = CONTRACTS
+    compiled_sol = get_contracts()
     contract_interface = compiled_sol[contract_entrypoint]
     return contract_interface
 
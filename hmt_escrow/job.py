@@ -155,7 +155,7 @@ class Job:
         gas_payer_priv (str): the private key of the gas_payer.
         amount (Decimal): an amount to be stored in the escrow contract.
         manifest_url (str): the location of the serialized manifest in IPFS.
-        manifest_hash (str): SHA-1 hashed version of the serialized manifest.
+        manifest_hash (str): SHA-256 hashed version of the serialized manifest.
 
     """
 
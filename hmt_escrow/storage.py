@@ -1,27 +1,59 @@
+import asyncio
 import hashlib
+import io
 import json
 import logging
+import logging.config
+import math
 import os
+import urllib.error
 import urllib.request
 import re
-from typing import Dict, Tuple, Optional, Union
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Callable, Dict, Iterator, List, Tuple, Optional, TypeVar, Union
 
 import boto3
-from botocore.exceptions import ClientError
+import orjson
+import zstandard
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError, IncompleteReadError, ReadTimeoutError
 
 from hmt_escrow import crypto
-
-SHARED_MAC_DATA: bytes = os.getenv(
-    "SHARED_MAC", "9da0d3721774843193737244a0f3355191f66ff7321e83eae83f7f746eb34350"
-).encode("ascii")
-
-logging.getLogger("boto").setLevel(logging.INFO)
-logging.getLogger("botocore").setLevel(logging.INFO)
-logging.getLogger("boto3").setLevel(logging.INFO)
+from hmt_escrow.crypto import SHARED_MAC_DATA
 
 DEBUG = "true" in os.getenv("DEBUG", "false").lower()
+STORAGE_COMPRESSION = "true" in os.getenv("STORAGE_COMPRESSION", "false").lower()
+STORAGE_COMPRESSION_LEVEL = int(os.getenv("STORAGE_COMPRESSION_LEVEL", 3))
+# Anyone can encrypt to a published public key, so downloaded frames are only
+# decompressed up to this size.
+STORAGE_MAX_DECOMPRESSED_SIZE = int(
+    os.getenv("STORAGE_MAX_DECOMPRESSED_SIZE", 128 * 1024 * 1024)
+)
 LOG = logging.getLogger("hmt_escrow.storage")
-LOG.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+
+if DEBUG:
+    # Incremental, so only these levels change and the application's own
+    # handlers and loggers are left as they are. boto is kept at INFO so its
+    # request dumps don't drown storage debug logs.
+    logging.config.dictConfig(
+        {
+            "version": 1,
+            "incremental": True,
+            "loggers": {
+                "hmt_escrow.storage": {"level": "DEBUG"},
+                "boto": {"level": "INFO"},
+                "botocore": {"level": "INFO"},
+                "boto3": {"level": "INFO"},
+            },
+        }
+    )
+else:
+    LOG.setLevel(logging.INFO)
 
 ESCROW_BUCKETNAME = os.getenv("ESCROW_BUCKETNAME", "escrow-results")
 ESCROW_PUBLIC_BUCKETNAME = os.getenv(
@@ -41,7 +73,52 @@ ESCROW_RESULTS_AWS_S3_SECRET_ACCESS_KEY = os.getenv(
 ESCROW_AWS_REGION = os.getenv("ESCROW_AWS_REGION", "us-west-2")
 
 ESCROW_ENDPOINT_URL = os.getenv("ESCROW_ENDPOINT_URL", "http://minio:9000")
-ESCROW_PUBLIC_BUCKETNAME = os.getenv("ESCROW_PUBLIC_BUCKETNAME", ESCROW_ENDPOINT_URL)
+
+# Concurrency used by the batch helpers (upload_many / download_many).
+STORAGE_MAX_WORKERS = int(os.getenv("STORAGE_MAX_WORKERS", 32))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", 5))
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", 5))
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", 30))
+
+S3_CLIENT_CONFIG = Config(
+    signature_version="s3v4",
+    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+    connect_timeout=S3_CONNECT_TIMEOUT,
+    read_timeout=S3_READ_TIMEOUT,
+    retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "adaptive"},
+)
+
+# Retries for transient network errors botocore does not cover itself, like a
+# response body cut mid-read or a 5xx from a public URL.
+STORAGE_RETRIES = int(os.getenv("STORAGE_RETRIES", 3))
+STORAGE_RETRY_DELAY = float(os.getenv("STORAGE_RETRY_DELAY", 0.5))
+STORAGE_RETRY_BACKOFF = float(os.getenv("STORAGE_RETRY_BACKOFF", 2))
+STORAGE_RETRY_MAX_DELAY = float(os.getenv("STORAGE_RETRY_MAX_DELAY", 5))
+
+# Payloads from this size on are uploaded as parallel multipart transfers.
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 10))
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=S3_MULTIPART_THRESHOLD,
+    max_concurrency=S3_MAX_CONCURRENCY,
+    use_threads=True,
+)
+
+# Matches fully qualified http(s) URLs, compiled once as download runs per key.
+URL_PATTERN = re.compile(
+    "^https?:\\/\\/(?:www\\.)?[-a-zA-Z0-9@:%._\\+~#=]{1,256}\\.[a-zA-Z0-9()]{1,6}\\b(?:[-a-zA-Z0-9()@:%_\\+.~#?&\\/=]*)$"
+)
+
+# Zstandard frame magic number, used to tell compressed payloads apart.
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# zstandard (de)compressors must not be shared between threads.
+_ZSTD = threading.local()
+
+
+T = TypeVar("T")
 
 
 class StorageClientError(Exception):
@@ -56,6 +133,47 @@ class StorageFileNotFoundError(StorageClientError):
     pass
 
 
+class _BodyReadError(Exception):
+    """Wraps an error raised while reading a S3 object body.
+
+    botocore retries failures of the request itself, but not of the body read
+    once the response came back, so only these are retried again here.
+    """
+
+    pass
+
+
+class _ChunksReader(io.RawIOBase):
+    """Read-only, non-seekable file object over an iterator of bytes chunks.
+
+    Reads are filled up to the requested size, as s3transfer expects full
+    parts from non-seekable streams.
+    """
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._pending = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = 0
+        while size < len(buffer):
+            if not self._pending:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    break
+                self._pending = memoryview(chunk)
+                continue
+
+            amount = min(len(buffer) - size, len(self._pending))
+            buffer[size : size + amount] = self._pending[:amount]
+            self._pending = self._pending[amount:]
+            size += amount
+        return size
+
+
 def _connect_s3(use_public_bucket=False):
     try:
         if use_public_bucket:
@@ -63,6 +181,7 @@ def _connect_s3(use_public_bucket=False):
                 "s3",
                 aws_access_key_id=ESCROW_RESULTS_AWS_S3_ACCESS_KEY_ID,
                 aws_secret_access_key=ESCROW_RESULTS_AWS_S3_SECRET_ACCESS_KEY,
+                config=S3_CLIENT_CONFIG,
             )
         else:
             return boto3.client(
@@ -71,12 +190,161 @@ def _connect_s3(use_public_bucket=False):
                 aws_secret_access_key=ESCROW_AWS_SECRET_ACCESS_KEY,
                 endpoint_url=ESCROW_ENDPOINT_URL,
                 region_name=ESCROW_AWS_REGION,
+                config=S3_CLIENT_CONFIG,
             )
     except Exception as e:
-        LOG.error(f"Connection with S3 failed because of: {e}")
+        LOG.error("Connection with S3 failed because of: %s", e)
         raise e
 
 
+@lru_cache(maxsize=2)
+def _get_s3_client(use_public_bucket=False):
+    """Returns a S3 client shared across calls, one per bucket type.
+
+    boto3 clients are thread-safe, so reusing them keeps the connection pool
+    warm instead of paying credential resolution and TLS handshakes on each
+    call. Use ``_get_s3_client.cache_clear()`` to pick up new settings.
+    """
+    return _connect_s3(use_public_bucket)
+
+
+def _is_transient(error: Exception) -> bool:
+    """Returns whether a failed transfer is worth retrying."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    # DNS or certificate failures won't get better on retry.
+    if isinstance(error, urllib.error.URLError):
+        error = error.reason
+    return isinstance(
+        error, (_BodyReadError, ConnectionError, TimeoutError, socket.timeout)
+    )
+
+
+def _with_transient_retry(fn: Callable[[], T]) -> T:
+    """Runs a network call, retrying it with exponential backoff on transient errors.
+
+    Only the transfer is retried, so callers don't redo serialization or
+    encryption. Any other error is raised straight away.
+
+    Args:
+        fn: the call to run.
+
+    Returns:
+        the result of the call.
+
+    Raises:
+        Exception: the last error once retries are exhausted.
+    """
+    wait_time = STORAGE_RETRY_DELAY
+    for attempt in range(STORAGE_RETRIES + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == STORAGE_RETRIES or not _is_transient(e):
+                raise
+            LOG.debug(
+                "(x%d) transient storage error: %s. Retrying after %s sec...",
+                attempt + 1,
+                e,
+                wait_time,
+            )
+            time.sleep(wait_time)
+            wait_time = min(wait_time * STORAGE_RETRY_BACKOFF, STORAGE_RETRY_MAX_DELAY)
+
+
+def _compress(data: bytes) -> bytes:
+    """Compresses data into a zstandard frame."""
+    compressor = getattr(_ZSTD, "compressor", None)
+    if compressor is None:
+        compressor = zstandard.ZstdCompressor(level=STORAGE_COMPRESSION_LEVEL)
+        _ZSTD.compressor = compressor
+    return compressor.compress(data)
+
+
+def _decompress(data: bytes) -> bytes:
+    """Decompresses data if it is a zstandard frame, returns it untouched otherwise.
+
+    Raises:
+        StorageClientError: if the frame doesn't declare its size or declares
+            more than STORAGE_MAX_DECOMPRESSED_SIZE.
+    """
+    if data[: len(ZSTD_MAGIC)] != ZSTD_MAGIC:
+        return data
+
+    # _compress always writes the content size, frames without it are refused
+    # rather than decompressed without a bound.
+    size = zstandard.frame_content_size(data)
+    if size < 0 or size > STORAGE_MAX_DECOMPRESSED_SIZE:
+        raise StorageClientError(
+            f"Refusing to decompress a zstandard frame of size {size}"
+        )
+
+    decompressor = getattr(_ZSTD, "decompressor", None)
+    if decompressor is None:
+        decompressor = zstandard.ZstdDecompressor()
+        _ZSTD.decompressor = decompressor
+    return decompressor.decompress(data)
+
+
+def _has_non_finite(obj) -> bool:
+    """Returns whether obj holds a NaN or infinite float."""
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite(value) for value in obj)
+    return False
+
+
+def _str_key(key):
+    """Converts a dict key to str the way orjson's OPT_NON_STR_KEYS does."""
+    if key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    return key
+
+
+def _with_str_keys(obj):
+    """Converts dict keys to str throughout obj, so the json fallback sorts
+    them as strings like orjson does."""
+    if isinstance(obj, dict):
+        return {_str_key(key): _with_str_keys(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_with_str_keys(value) for value in obj]
+    return obj
+
+
+def _dumps(msg: Dict) -> bytes:
+    """Serializes a message to JSON with sorted keys.
+
+    Falls back to the json module for what orjson can't encode: integers
+    beyond 64 bits, and NaN or infinite floats, which orjson writes as null.
+    """
+    try:
+        content = orjson.dumps(
+            msg, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        )
+    except orjson.JSONEncodeError:
+        pass
+    else:
+        # Non-finite floats can only hide behind a null, skip the walk otherwise.
+        if b"null" not in content or not _has_non_finite(msg):
+            return content
+
+    return json.dumps(
+        _with_str_keys(msg), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    ).encode("utf-8")
+
+
+def _loads(data: bytes) -> Dict:
+    """Parses JSON, falling back to the json module for what orjson rejects,
+    like the NaN and Infinity tokens json.dumps writes."""
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
+
+
 def get_bucket(public: bool = False) -> str:
     """Retrieves correct bucket (private/public).
 
@@ -126,13 +394,29 @@ def download_from_storage(key: str, public: bool = False) -> bytes:
     Args:
          key(str): file key to find it in storage to be downloaded.
          public(bool): whether file is public
+
+    Returns:
+        bytes: the file content.
     """
-    LOG.debug("Downloading s3 key: {}".format(key))
+    LOG.debug("Downloading s3 key: %s", key)
     bucket_name = get_bucket(public=public)
 
-    BOTO3_CLIENT = _connect_s3()
-    try:
+    BOTO3_CLIENT = _get_s3_client()
+
+    def fetch() -> bytes:
         response = BOTO3_CLIENT.get_object(Bucket=bucket_name, Key=key)
+        try:
+            return response["Body"].read()
+        except (
+            ReadTimeoutError,
+            IncompleteReadError,
+            ConnectionError,
+            TimeoutError,
+        ) as e:
+            raise _BodyReadError(str(e)) from e
+
+    try:
+        return _with_transient_retry(fetch)
     except ClientError as e:
         if e.response["Error"]["Code"] == "NoSuchKey":
             raise StorageFileNotFoundError("No object found - returning empty")
@@ -140,13 +424,16 @@ def download_from_storage(key: str, public: bool = False) -> bytes:
         raise StorageClientError(str(e))
 
     except Exception as e:
+        # Surface the original read error rather than the retry marker.
+        if isinstance(e, _BodyReadError):
+            e = e.__cause__
         LOG.warning(
-            f"Reading the key {key} with S3 failed (public: {public}"
-            f" because of: {str(e)}"
+            "Reading the key %s with S3 failed (public: %s) because of: %s",
+            key,
+            public,
+            e,
         )
         raise e
-    else:
-        return response["Body"].read()
 
 
 def download(key: str, private_key: bytes, public: bool = False) -> Dict:
@@ -165,25 +452,26 @@ def download(key: str, private_key: bytes, public: bool = False) -> Dict:
 
     """
     try:
-        url_pattern = "^https?:\\/\\/(?:www\\.)?[-a-zA-Z0-9@:%._\\+~#=]{1,256}\\.[a-zA-Z0-9()]{1,6}\\b(?:[-a-zA-Z0-9()@:%_\\+.~#?&\\/=]*)$"
-        is_url = re.match(url_pattern, key)
+        is_url = URL_PATTERN.match(key)
         content = (
-            urllib.request.urlopen(key).read()
+            _with_transient_retry(lambda: urllib.request.urlopen(key).read())
             if is_url
             else download_from_storage(key=key, public=public)
         )
         artifact = (
-            crypto.decrypt(private_key, content)
+            _decompress(crypto.decrypt_bytes(private_key, content))
             if crypto.is_encrypted(content) is True
-            else content.decode()
+            else content
         )
     except Exception as e:
         LOG.warning(
-            "Reading the key {!r} with private key {!r} with S3 failed"
-            " because of: {!r}".format(key, private_key, e)
+            "Reading the key %r with private key %r with S3 failed because of: %r",
+            key,
+            private_key,
+            e,
         )
         raise e
-    return json.loads(artifact)
+    return _loads(artifact)
 
 
 def upload(
@@ -210,29 +498,163 @@ def upload(
 
     """
     try:
-        artifact = json.dumps(msg, sort_keys=True)
+        content = _dumps(msg)
     except Exception as e:
         LOG.error("Can't extract the json from the dict")
         raise e
 
-    content = artifact.encode("utf-8")
-
-    hash_ = hashlib.sha1(content).hexdigest()
+    hash_ = hashlib.sha256(content).hexdigest()
     key = f"s3{hash_}"
 
     # Get private or public bucket name
     bucket_name = get_bucket(public=use_public_bucket)
 
-    # If encryption is on, use crypto.encrypt function, else use utf-8 encoded artifact
-    body = crypto.encrypt(public_key, artifact) if encrypt_data is True else content
-    bucket_kwargs: Dict[str, Union[str, bytes]] = {
-        "Body": body,
-        "Bucket": bucket_name,
-        "Key": key,
-    }
-
-    boto3_client = _connect_s3(use_public_bucket)
-    boto3_client.put_object(**bucket_kwargs)
+    # If encryption is on, use crypto.encrypt function, else use the serialized artifact.
+    # Only encrypted payloads are compressed: plain ones are served to third
+    # parties as-is through the public bucket.
+    payload = (
+        _compress(content) if encrypt_data is True and STORAGE_COMPRESSION else content
+    )
+
+    boto3_client = _get_s3_client(use_public_bucket)
+    # Small payloads are latency bound, a single PUT is the fastest there.
+    if len(payload) < S3_MULTIPART_THRESHOLD:
+        body = crypto.encrypt(public_key, payload) if encrypt_data is True else payload
+        bucket_kwargs: Dict[str, Union[str, bytes]] = {
+            "Body": body,
+            "Bucket": bucket_name,
+            "Key": key,
+        }
+        boto3_client.put_object(**bucket_kwargs)
+    else:
+        # Large payloads are encrypted chunk by chunk as the transfer reads
+        # them, so the parts already encrypted are sent meanwhile.
+        fileobj = (
+            _ChunksReader(crypto.encrypt_stream(public_key, payload))
+            if encrypt_data is True
+            else io.BytesIO(payload)
+        )
+        boto3_client.upload_fileobj(fileobj, bucket_name, key, Config=TRANSFER_CONFIG)
 
-    LOG.debug(f"Uploaded to S3, key: {key}")
+    LOG.debug("Uploaded to S3, key: %s", key)
     return hash_, key
+
+
+def download_many(
+    keys: List[str], private_key: bytes, public: bool = False
+) -> List[Dict]:
+    """Download and decrypt several keys concurrently.
+
+    Args:
+        keys (List[str]): The hash codes returned when uploading.
+        private_key (bytes): The private_key to decrypt the files with.
+        public(bool): whether files are public
+
+    Returns:
+        List[Dict]: returns the contents of each key, in the same order as keys.
+
+    Raises:
+        Exception: if reading any of the keys fails.
+
+    """
+    if not keys:
+        return []
+
+    download_key = partial(download, private_key=private_key, public=public)
+    with ThreadPoolExecutor(max_workers=min(STORAGE_MAX_WORKERS, len(keys))) as pool:
+        return list(pool.map(download_key, keys))
+
+
+def upload_many(
+    items: List[Tuple[Dict, bytes]],
+    encrypt_data=True,
+    use_public_bucket=False,
+) -> List[Tuple[str, str]]:
+    """Upload and encrypt several messages concurrently.
+
+    Args:
+        items (List[Tuple[Dict, bytes]]): (message, public_key) pairs to upload.
+        encrypt_data (bool): Whether data must be encrypted before uploading.
+        use_public_bucket (bool): Whether data must be stored in the public bucket.
+
+    Returns:
+        List[Tuple[str, str]]: returns the (hash, key) of each upload, in the
+            same order as items.
+
+    Raises:
+        Exception: if adding bytes fails for any of the items.
+
+    """
+    if not items:
+        return []
+
+    def upload_item(item: Tuple[Dict, bytes]) -> Tuple[str, str]:
+        msg, public_key = item
+        return upload(
+            msg,
+            public_key,
+            encrypt_data=encrypt_data,
+            use_public_bucket=use_public_bucket,
+        )
+
+    with ThreadPoolExecutor(max_workers=min(STORAGE_MAX_WORKERS, len(items))) as pool:
+        return list(pool.map(upload_item, items))
+
+
+async def download_async(key: str, private_key: bytes, public: bool = False) -> Dict:
+    """Download and decrypt a key without blocking the event loop.
+
+    The transfer and decryption run in the loop's default executor over the
+    shared S3 client, so many calls can be awaited concurrently, e.g. with
+    ``asyncio.gather``.
+
+    Args:
+        key (str): This is the hash code returned when uploading.
+        private_key (bytes): The private_key to decrypt this string with.
+        public(bool): whether file is public
+
+    Returns:
+        Dict: returns the contents of the filename which was previously uploaded.
+
+    Raises:
+        Exception: if reading from fails.
+
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, partial(download, key, private_key, public=public)
+    )
+
+
+async def upload_async(
+    msg: Dict,
+    public_key: bytes,
+    encrypt_data=True,
+    use_public_bucket=False,
+) -> Tuple[str, str]:
+    """Upload and encrypt a message without blocking the event loop.
+
+    Args:
+        msg (Dict): The message to upload and encrypt.
+        public_key (bytes): The public_key to encrypt the file for.
+        encrypt_data (bool): Whether data must be encrypted before uploading.
+        use_public_bucket (bool): Whether data must be stored in the public bucket.
+
+    Returns:
+        Tuple[str, str]: returns the (hash, key) of the upload.
+
+    Raises:
+        Exception: if adding bytes fails.
+
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None,
+        partial(
+            upload,
+            msg,
+            public_key,
+            encrypt_data=encrypt_data,
+            use_public_bucket=use_public_bucket,
+        ),
+    )
@@ -18,6 +18,8 @@ setuptools.setup(
         "boto3",
         "cryptography",
         "hmt-basemodels>=0.1.18",
+        "orjson",
         "web3==5.24.0",
+        "zstandard",
     ],
 )
@@ -43,6 +43,18 @@ class EncryptionServiceTest(unittest.TestCase):
 
         self.assertEqual(decrypted, self.data)
 
+    def test_key_objects_are_cached(self):
+        """Tests parsed keys are reused across encryption/decryption calls."""
+        crypto._priv_key_obj.cache_clear()
+        crypto._pub_key_obj.cache_clear()
+
+        for _ in range(3):
+            encrypted = crypto.encrypt(self.public_key, self.data)
+            self.assertEqual(crypto.decrypt(self.private_key, encrypted), self.data)
+
+        self.assertEqual(crypto._priv_key_obj.cache_info().misses, 1)
+        self.assertEqual(crypto._pub_key_obj.cache_info().misses, 1)
+
     def test_is_encrypted(self):
         """Tests verification whether some data is already encrypted."""
         data = "some data to be encrypted".encode("utf-8")
@@ -67,3 +67,17 @@ class EncryptionServiceTest(unittest.TestCase):
         decrypted = self.encryption.decrypt(encrypted, self.private_key)
 
         self.assertEqual(decrypted, self.data)
+
+    def test_encrypt_stream(self):
+        """Tests data encrypted in chunks can be decrypted as a whole."""
+        self.encryption.STREAM_CHUNK_SIZE = 64
+        chunks = list(self.encryption.encrypt_stream(self.data, self.public_key))
+        self.assertGreater(len(chunks), 2)
+
+        encrypted = b"".join(chunks)
+        self.assertEqual(
+            len(encrypted), len(self.encryption.encrypt(self.data, self.public_key))
+        )
+        self.assertEqual(
+            self.encryption.decrypt(encrypted, self.private_key), self.data
+        )
@@ -3,6 +3,10 @@ from unittest.mock import patch
 
 from hmt_escrow.storage import (
     _connect_s3,
+    _get_s3_client,
+    S3_CONNECT_TIMEOUT,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_READ_TIMEOUT,
     get_bucket,
     get_public_bucket_url,
     get_key_from_url,
@@ -112,6 +116,33 @@ class BucketTest(unittest.TestCase):
             ESCROW_RESULTS_AWS_S3_SECRET_ACCESS_KEY,
         )
 
+    @patch("hmt_escrow.storage.boto3")
+    def test_connect_uses_tuned_client_config(self, boto3):
+        """Tests both bucket clients share the tuned pool/timeout/retry config."""
+        for use_public_bucket in (False, True):
+            _connect_s3(use_public_bucket)
+            config = boto3.client.call_args.kwargs["config"]
+            self.assertEqual(config.max_pool_connections, S3_MAX_POOL_CONNECTIONS)
+            self.assertEqual(config.connect_timeout, S3_CONNECT_TIMEOUT)
+            self.assertEqual(config.read_timeout, S3_READ_TIMEOUT)
+            self.assertEqual(config.retries["mode"], "adaptive")
+
+    @patch("hmt_escrow.storage.boto3")
+    def test_s3_client_is_reused(self, boto3):
+        """Tests S3 clients are built once per bucket type and then reused."""
+        _get_s3_client.cache_clear()
+        self.addCleanup(_get_s3_client.cache_clear)
+        boto3.client.side_effect = lambda *args, **kwargs: object()
+
+        private_client = _get_s3_client(False)
+        self.assertIs(_get_s3_client(False), private_client)
+
+        public_client = _get_s3_client(True)
+        self.assertIs(_get_s3_client(True), public_client)
+        self.assertIsNot(public_client, private_client)
+
+        self.assertEqual(boto3.client.call_count, 2)
+
 
 if __name__ == "__main__":
     unittest.main(exit=True)
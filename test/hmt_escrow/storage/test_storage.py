@@ -1,10 +1,31 @@
+import asyncio
+import hashlib
+import io
 import json
 import logging
+import math
+import socket
+import ssl
 import unittest
+import urllib.error
 from unittest.mock import MagicMock, patch
 
+import orjson
+import zstandard
+from botocore.exceptions import ReadTimeoutError
+
 from hmt_escrow import crypto
-from hmt_escrow.storage import upload, download, download_from_storage
+from hmt_escrow.storage import (
+    upload,
+    upload_many,
+    upload_async,
+    download,
+    download_many,
+    download_async,
+    download_from_storage,
+    StorageClientError,
+    ZSTD_MAGIC,
+)
 from test.hmt_escrow.utils import test_manifest
 
 ESCROW_TEST_BUCKETNAME = "test-escrow-results"
@@ -38,7 +59,7 @@ class StorageTest(unittest.TestCase):
         """
 
         s3_client_mock = MagicMock()
-        with patch("hmt_escrow.storage._connect_s3") as mock_s3:
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
             mock_s3.return_value = s3_client_mock
 
             upload(
@@ -62,7 +83,7 @@ class StorageTest(unittest.TestCase):
         """Tests uploading file to storage to public bucket only when encryption is off."""
 
         s3_client_mock = MagicMock()
-        with patch("hmt_escrow.storage._connect_s3") as mock_s3:
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
             mock_s3.return_value = s3_client_mock
 
             upload(
@@ -87,7 +108,7 @@ class StorageTest(unittest.TestCase):
         Tests data persisted in storage is encrypted.
         """
         s3_client_mock = MagicMock()
-        with patch("hmt_escrow.storage._connect_s3") as mock_s3:
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
             mock_s3.return_value = s3_client_mock
 
             # Encryption on (default).
@@ -101,14 +122,17 @@ class StorageTest(unittest.TestCase):
             uploaded_content = crypto.decrypt(
                 self.priv_key, s3_client_mock.put_object.call_args.kwargs["Body"]
             )
-            self.assertEqual(json.dumps(data, sort_keys=True), uploaded_content)
+            self.assertEqual(
+                orjson.dumps(data, option=orjson.OPT_SORT_KEYS).decode(),
+                uploaded_content,
+            )
 
     def test_upload_with_disabled_encryption_option(self):
         """
         Tests data persisted in storage is plain.
         """
         s3_client_mock = MagicMock()
-        with patch("hmt_escrow.storage._connect_s3") as mock_s3:
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
             mock_s3.return_value = s3_client_mock
             # Encryption off.
             data = self.get_manifest()
@@ -120,15 +144,170 @@ class StorageTest(unittest.TestCase):
             # Data to be uploaded must be plain
             uploaded_content = s3_client_mock.put_object.call_args.kwargs["Body"]
             self.assertEqual(
-                json.dumps(data, sort_keys=True), uploaded_content.decode()
+                orjson.dumps(data, option=orjson.OPT_SORT_KEYS), uploaded_content
+            )
+
+    @patch("hmt_escrow.storage.STORAGE_COMPRESSION", True)
+    def test_upload_with_compression(self):
+        """Tests encrypted data is compressed and transparently downloaded."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            data = self.get_manifest()
+            upload(data, self.pub_key, encrypt_data=True)
+            body = s3_client_mock.put_object.call_args.kwargs["Body"]
+
+        # Plaintext under the encryption is a zstandard frame
+        self.assertTrue(
+            crypto.decrypt_bytes(self.priv_key, body).startswith(ZSTD_MAGIC)
+        )
+
+        with patch("hmt_escrow.storage.download_from_storage") as download_mock:
+            download_mock.return_value = body
+            self.assertEqual(download(key="s3aaa", private_key=self.priv_key), data)
+
+    @patch("hmt_escrow.storage.STORAGE_MAX_DECOMPRESSED_SIZE", 1024)
+    def test_download_refuses_oversized_frames(self):
+        """Tests frames declaring too large or no content size are not decompressed."""
+        oversized = zstandard.ZstdCompressor().compress(b"{}" + b" " * 4096)
+        unsized = zstandard.ZstdCompressor(write_content_size=False).compress(b"{}")
+
+        for frame in (oversized, unsized):
+            with patch("hmt_escrow.storage.download_from_storage") as download_mock:
+                download_mock.return_value = crypto.encrypt(self.pub_key, frame)
+                with self.assertRaises(StorageClientError):
+                    download(key="s3aaa", private_key=self.priv_key)
+
+    @patch("hmt_escrow.storage.ESCROW_BUCKETNAME", ESCROW_TEST_BUCKETNAME)
+    def test_upload_large_payload_as_multipart(self):
+        """Tests payloads above the multipart threshold go through upload_fileobj."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3, patch(
+            "hmt_escrow.storage.S3_MULTIPART_THRESHOLD", 1
+        ):
+            mock_s3.return_value = s3_client_mock
+
+            data = self.get_manifest()
+            _, key = upload(data, self.pub_key, encrypt_data=False)
+
+            s3_client_mock.put_object.assert_not_called()
+            fileobj, bucket, uploaded_key = s3_client_mock.upload_fileobj.call_args.args
+            self.assertEqual(bucket, ESCROW_TEST_BUCKETNAME)
+            self.assertEqual(uploaded_key, key)
+            self.assertEqual(
+                fileobj.getvalue(), orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+            )
+
+    def test_upload_large_encrypted_payload_as_stream(self):
+        """Tests encrypted payloads above the multipart threshold are streamed."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3, patch(
+            "hmt_escrow.storage.S3_MULTIPART_THRESHOLD", 1
+        ):
+            mock_s3.return_value = s3_client_mock
+
+            data = self.get_manifest()
+            upload(data, self.pub_key)
+
+            s3_client_mock.put_object.assert_not_called()
+            fileobj = s3_client_mock.upload_fileobj.call_args.args[0]
+            self.assertFalse(fileobj.seekable())
+
+            # Parts are read whole, as multipart uploads require.
+            head = fileobj.read(100)
+            self.assertEqual(len(head), 100)
+
+            encrypted = head + fileobj.read()
+            self.assertEqual(fileobj.read(), b"")
+            self.assertEqual(json.loads(crypto.decrypt(self.priv_key, encrypted)), data)
+
+    def test_upload_key_is_content_hash(self):
+        """Tests uploaded key is derived from the SHA-256 of the serialized data."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            data = self.get_manifest()
+            hash_, key = upload(data, self.pub_key, encrypt_data=False)
+
+            expected_hash = hashlib.sha256(
+                orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+            ).hexdigest()
+            self.assertEqual(hash_, expected_hash)
+            self.assertEqual(key, f"s3{expected_hash}")
+            self.assertEqual(s3_client_mock.put_object.call_args.kwargs["Key"], key)
+
+    def test_upload_payloads_orjson_cannot_encode(self):
+        """Tests non-str keys and integers beyond 64 bits can be uploaded."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            for msg in ({1: "a", "b": 2}, {"amount": 25 * 10**18}):
+                upload(msg, self.pub_key, encrypt_data=False)
+
+                body = s3_client_mock.put_object.call_args.kwargs["Body"]
+                self.assertEqual(json.loads(body), json.loads(json.dumps(msg)))
+
+    def test_upload_keys_are_sorted_alike_by_both_serializers(self):
+        """Tests int keys are ordered the same whether or not the json fallback is used."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            upload({10: "a", 2: "b", "amount": 1}, self.pub_key, encrypt_data=False)
+            self.assertEqual(
+                s3_client_mock.put_object.call_args.kwargs["Body"],
+                b'{"10":"a","2":"b","amount":1}',
             )
 
+            upload(
+                {10: "a", 2: "b", "amount": 25 * 10**18},
+                self.pub_key,
+                encrypt_data=False,
+            )
+            self.assertEqual(
+                s3_client_mock.put_object.call_args.kwargs["Body"],
+                b'{"10":"a","2":"b","amount":25000000000000000000}',
+            )
+
+    def test_upload_and_download_document_with_nan(self):
+        """Tests NaN/Infinity values are kept through an upload and download."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            upload({"a": float("nan"), "b": [float("-inf")], "c": None}, self.pub_key)
+            body = s3_client_mock.put_object.call_args.kwargs["Body"]
+
+        with patch("hmt_escrow.storage.download_from_storage") as download_mock:
+            download_mock.return_value = body
+
+            downloaded = download(key="s3aaa", private_key=self.priv_key)
+
+        self.assertTrue(math.isnan(downloaded["a"]))
+        self.assertEqual(downloaded["b"], [float("-inf")])
+        self.assertIsNone(downloaded["c"])
+
+    def test_download_document_with_nan(self):
+        """Tests documents holding the NaN/Infinity tokens json writes can be read."""
+        sample_data = json.dumps({"a": float("nan"), "b": float("inf")})
+
+        with patch("hmt_escrow.storage.download_from_storage") as download_mock:
+            download_mock.return_value = crypto.encrypt(self.pub_key, sample_data)
+
+            downloaded = download(key="s3aaa", private_key=self.priv_key)
+
+        self.assertTrue(math.isnan(downloaded["a"]))
+        self.assertEqual(downloaded["b"], float("inf"))
+
     @patch("hmt_escrow.storage.ESCROW_BUCKETNAME", ESCROW_TEST_BUCKETNAME)
     def test_download_from_storage_from_private_bucket(self):
         """Tests download of file artifact from storage from private bucket."""
         # Encrypting data is on (default)
         s3_client_mock = MagicMock()
-        with patch("hmt_escrow.storage._connect_s3") as mock_s3:
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
             mock_s3.return_value = s3_client_mock
 
             download_from_storage(key="s3aaaa", public=False)
@@ -144,7 +323,7 @@ class StorageTest(unittest.TestCase):
     def test_download_from_storage_public_bucket(self):
         """Tests download of file artifact from storage from private bucket."""
         s3_client_mock = MagicMock()
-        with patch("hmt_escrow.storage._connect_s3") as mock_s3:
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
             mock_s3.return_value = s3_client_mock
 
             download_from_storage(key="s3aaaa", public=True)
@@ -225,6 +404,183 @@ class StorageTest(unittest.TestCase):
             self.assertEqual(json.dumps(downloaded), sample_data)
             mock_urlopen.assert_called_once()
 
+    @patch("hmt_escrow.storage.STORAGE_RETRY_DELAY", 0)
+    def test_download_from_storage_retries_interrupted_read(self):
+        """Tests a body read cut by a transient error is fetched again."""
+        data = crypto.encrypt(self.pub_key, json.dumps(self.get_manifest()))
+
+        interrupted_body = MagicMock()
+        interrupted_body.read.side_effect = ReadTimeoutError(endpoint_url="s3")
+        s3_client_mock = MagicMock()
+        s3_client_mock.get_object.side_effect = [
+            {"Body": interrupted_body},
+            {"Body": io.BytesIO(data)},
+        ]
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            content = download_from_storage(key="s3aaaa")
+
+        self.assertEqual(content, data)
+        self.assertEqual(s3_client_mock.get_object.call_count, 2)
+
+    @patch("hmt_escrow.storage.STORAGE_RETRY_DELAY", 0)
+    def test_download_from_storage_leaves_request_retries_to_botocore(self):
+        """Tests get_object failures, already retried by botocore, are not retried."""
+        s3_client_mock = MagicMock()
+        s3_client_mock.get_object.side_effect = ReadTimeoutError(endpoint_url="s3")
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            with self.assertRaises(ReadTimeoutError):
+                download_from_storage(key="s3aaaa")
+
+        s3_client_mock.get_object.assert_called_once()
+
+    @patch("hmt_escrow.storage.STORAGE_RETRY_DELAY", 0)
+    def test_download_from_storage_raises_read_error_once_retries_exhausted(self):
+        """Tests the original error is raised when the body read keeps failing."""
+        interrupted_body = MagicMock()
+        interrupted_body.read.side_effect = ReadTimeoutError(endpoint_url="s3")
+        s3_client_mock = MagicMock()
+        s3_client_mock.get_object.return_value = {"Body": interrupted_body}
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3, patch(
+            "hmt_escrow.storage.STORAGE_RETRIES", 2
+        ):
+            mock_s3.return_value = s3_client_mock
+
+            with self.assertRaises(ReadTimeoutError):
+                download_from_storage(key="s3aaaa")
+
+        self.assertEqual(s3_client_mock.get_object.call_count, 3)
+
+    @patch("hmt_escrow.storage.STORAGE_RETRY_DELAY", 0)
+    def test_download_from_public_resource_retries_server_errors(self):
+        """Tests only 5xx responses from a public URL are retried."""
+        file_key = "https://s3aaa.com"
+        sample_data = '{"a": 1, "b": 2}'
+
+        def http_error(code):
+            return urllib.error.HTTPError(file_key, code, "error", {}, None)
+
+        with patch("urllib.request.urlopen") as mock_urlopen:
+            cm = MagicMock()
+            cm.read.return_value = sample_data.encode("utf-8")
+            mock_urlopen.side_effect = [http_error(503), cm]
+
+            downloaded = download(key=file_key, private_key=self.priv_key)
+            self.assertEqual(json.dumps(downloaded), sample_data)
+            self.assertEqual(mock_urlopen.call_count, 2)
+
+            mock_urlopen.reset_mock()
+            mock_urlopen.side_effect = [http_error(404), cm]
+
+            with self.assertRaises(urllib.error.HTTPError):
+                download(key=file_key, private_key=self.priv_key)
+            mock_urlopen.assert_called_once()
+
+    @patch("hmt_escrow.storage.STORAGE_RETRY_DELAY", 0)
+    def test_download_from_public_resource_retries_only_network_errors(self):
+        """Tests URL errors are retried on timeouts and resets only."""
+        file_key = "https://s3aaa.com"
+        sample_data = '{"a": 1, "b": 2}'
+
+        with patch("urllib.request.urlopen") as mock_urlopen:
+            cm = MagicMock()
+            cm.read.return_value = sample_data.encode("utf-8")
+            mock_urlopen.side_effect = [
+                urllib.error.URLError(socket.timeout("timed out")),
+                urllib.error.URLError(ConnectionResetError()),
+                cm,
+            ]
+
+            downloaded = download(key=file_key, private_key=self.priv_key)
+            self.assertEqual(json.dumps(downloaded), sample_data)
+            self.assertEqual(mock_urlopen.call_count, 3)
+
+            for reason in (
+                socket.gaierror(socket.EAI_NONAME, "Name or service not known"),
+                ssl.SSLCertVerificationError("certificate verify failed"),
+            ):
+                mock_urlopen.reset_mock()
+                mock_urlopen.side_effect = [urllib.error.URLError(reason), cm]
+
+                with self.assertRaises(urllib.error.URLError):
+                    download(key=file_key, private_key=self.priv_key)
+                mock_urlopen.assert_called_once()
+
+    def test_upload_many(self):
+        """Tests uploading several files at once keeps the order of the items."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            manifests = [self.get_manifest() for _ in range(5)]
+            uploaded = upload_many(
+                [(manifest, self.pub_key) for manifest in manifests],
+                encrypt_data=False,
+            )
+
+            self.assertEqual(s3_client_mock.put_object.call_count, len(manifests))
+            self.assertEqual(
+                [upload(manifest, self.pub_key, False) for manifest in manifests],
+                uploaded,
+            )
+
+        self.assertEqual(upload_many([]), [])
+
+    def test_download_many(self):
+        """Tests downloading several files at once keeps the order of the keys."""
+        contents = {f"s3{i}": {"index": i} for i in range(5)}
+
+        with patch("hmt_escrow.storage.download_from_storage") as download_mock:
+            download_mock.side_effect = lambda key, public: crypto.encrypt(
+                self.pub_key, json.dumps(contents[key])
+            )
+
+            downloaded = download_many(list(contents), private_key=self.priv_key)
+            self.assertEqual(downloaded, list(contents.values()))
+
+        self.assertEqual(download_many([], private_key=self.priv_key), [])
+
+    @patch("hmt_escrow.storage.ESCROW_PUBLIC_BUCKETNAME", ESCROW_TEST_PUBLIC_BUCKETNAME)
+    @patch("hmt_escrow.storage.ESCROW_BUCKETNAME", ESCROW_TEST_BUCKETNAME)
+    def test_upload_async(self):
+        """Tests uploads can be awaited concurrently."""
+        s3_client_mock = MagicMock()
+        with patch("hmt_escrow.storage._get_s3_client") as mock_s3:
+            mock_s3.return_value = s3_client_mock
+
+            manifests = [self.get_manifest() for _ in range(3)]
+
+            async def upload_all():
+                return await asyncio.gather(
+                    *(upload_async(manifest, self.pub_key) for manifest in manifests)
+                )
+
+            uploaded = asyncio.run(upload_all())
+            self.assertEqual(s3_client_mock.put_object.call_count, len(manifests))
+            self.assertEqual(
+                [upload(manifest, self.pub_key) for manifest in manifests],
+                uploaded,
+            )
+
+    def test_download_async(self):
+        """Tests downloads can be awaited concurrently and keep their order."""
+        contents = {f"s3{i}": {"index": i} for i in range(5)}
+
+        with patch("hmt_escrow.storage.download_from_storage") as download_mock:
+            download_mock.side_effect = lambda key, public: crypto.encrypt(
+                self.pub_key, json.dumps(contents[key])
+            )
+
+            async def download_all():
+                return await asyncio.gather(
+                    *(download_async(key, self.priv_key) for key in contents)
+                )
+
+            self.assertEqual(asyncio.run(download_all()), list(contents.values()))
+
 
 if __name__ == "__main__":
     unittest.main(exit=True)
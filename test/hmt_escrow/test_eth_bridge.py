@@ -5,7 +5,9 @@ from hmt_escrow.eth_bridge import (
     get_hmtoken,
     get_factory,
     get_escrow,
+    get_contracts,
     get_pub_key_from_addr,
+    get_w3,
     handle_transaction,
     set_pub_key_at_addr,
 )
@@ -52,6 +54,37 @@ class EthBridgeTestCase(unittest.TestCase):
             set_pub_key_at_addr(self.rep_oracle_pub_key).transactionHash
         )
 
+    def test_get_w3_is_reused(self):
+        w3 = get_w3()
+        self.assertIs(get_w3(), w3)
+        self.assertIsNot(get_w3("http://localhost:8546"), w3)
+
+    def test_get_w3_is_not_shared_across_threads(self):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        endpoint = "wss://localhost:8546"
+        # The barrier makes every call run on its own worker thread.
+        barrier = threading.Barrier(4)
+
+        def get_client(_):
+            w3 = get_w3(endpoint)
+            barrier.wait()
+            self.assertIs(get_w3(endpoint), w3)
+            return w3
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            clients = list(pool.map(get_client, range(4)))
+
+        self.assertEqual(len({id(w3.provider) for w3 in clients}), len(clients))
+
+    def test_contracts_are_compiled_once(self):
+        from hmt_escrow import eth_bridge
+
+        contracts = get_contracts()
+        self.assertIs(get_contracts(), contracts)
+        self.assertIs(eth_bridge.CONTRACTS, contracts)
+
 
 if __name__ == "__main__":
     unittest.main(exit=True)